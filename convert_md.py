@@ -1,7 +1,16 @@
+import codecs
+import functools
+import hashlib
 import os
 import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import subprocess
+import tempfile
+import threading
 import urllib.parse
+from html import escape as html_escape
 from pathlib import Path
 
 try:
@@ -9,6 +18,44 @@ try:
 except Exception:
     Image = None
 
+# 批量模式下插在各 Markdown 之间的分隔标记（Pandoc 会把 HTML 注释原样输出，随后据此拆分 HTML）
+BATCH_SEPARATOR = "<!-- CD985272F78311 -->"
+# 单次 Pandoc 调用最多合并的文件数（避免 Windows 命令行超长）
+BATCH_SIZE = 50
+# 转换缓存目录（位于目标目录下，例如 webp -> png 的结果）
+CACHE_DIR_NAME = ".convert-md-cache"
+
+# 遍历时跳过的目录（另外所有以 . 开头的隐藏目录也会跳过，包括上面的缓存目录）
+SKIP_DIR_NAMES = {".git", "node_modules", CACHE_DIR_NAME}
+
+# 常用正则预先编译，避免每个文件/每次调用重复编译
+_URL_ATTR_RE = re.compile(r"(\b(?:src|href|srcset)=)(\"|')(.*?)(\2)", re.IGNORECASE)
+_EMPTY_ATTR_RE = re.compile(r"""(href|src)=(""|'')|about:blank""")
+_BODY_OPEN_RE = re.compile(r"<body\b[^>]*>", re.IGNORECASE)
+_TITLE_RE = re.compile(r"<title>.*?</title>", re.DOTALL)
+# Pandoc 3.x 的 --file-scope 会把每个输入文件包在 <div id="<文件标识>"> 里（分隔文件也不例外）
+_WRAPPER_OPEN_TAIL_RE = re.compile(r"<div id=\"([^\"]*)\">\s*$")
+_WRAPPER_CLOSE_HEAD_RE = re.compile(r"^\s*</div>")
+_WRAPPER_OPEN_HEAD_RE = re.compile(r"^\s*<div id=\"([^\"]*)\">")
+# URL scheme（http:、data:、mailto: 等）；至少两个字符，避免把 C: 这样的盘符当成 scheme
+_URL_SCHEME_RE = re.compile(r"[a-zA-Z][a-zA-Z0-9+.-]+:")
+
+# 校验 Markdown 是否为 UTF-8 时每次读取的块大小
+UTF8_CHECK_CHUNK_SIZE = 1 << 20
+
+# 单个 HTML 中本地 URL 达到该数量时，用线程池并发解析路径（stat）
+PREFETCH_MIN_URLS = 8
+PREFETCH_MAX_WORKERS = 16
+
+# 并行转换的最大进程数（wkhtmltopdf 较吃内存，不宜开太多）
+MAX_WORKERS = 8
+
+
+""" 检测命令行工具是否在 PATH 中（纯路径查找，无需启动子进程；结果在进程内缓存）"""
+@functools.lru_cache(maxsize=None)
+def _is_tool_installed(name: str) -> bool:
+    return shutil.which(name) is not None
+
 
 class ConvertMD:
     def __init__(self, target_folder, css_path=None, keep_html_on_success=False):
@@ -43,23 +90,42 @@ class ConvertMD:
         # 因此补一份“兼容 Pandoc HTML”的 CSS，让图片/代码块样式更接近 Typora。
         self.compat_css_path = r"assets\typora_compat_pandoc.css"
 
+        # 命令行中每个文件都相同的部分预先拼好，逐个文件组装命令时只追加变化的参数
+        # 说明：
+        # - --enable-local-file-access：允许加载本地图片/CSS/字体（Windows 下非常关键）
+        # - --encoding utf-8：避免中文在部分环境下出现乱码
+        # - --print-media-type：更接近 Typora/浏览器“打印”的排版
+        # - --disable-smart-shrinking：避免字号/布局被自动缩放导致和 Typora 差异过大
+        # 注意：构造之后再修改 wkhtmltopdf_style_args 不会生效。
+        self._wkhtml_cmd_prefix = [
+            "wkhtmltopdf",
+            "--enable-local-file-access",
+            # CSS 里引用的本地字体/图片缺失时，默认会导致 wkhtmltopdf 直接失败退出
+            # 这里改为忽略加载错误，让转换尽可能产出 PDF（样式缺失会在控制台警告）
+            "--load-error-handling",
+            "ignore",
+            "--load-media-error-handling",
+            "ignore",
+            "--encoding",
+            "utf-8",
+            *self.wkhtmltopdf_style_args,
+        ]
+        # Pandoc 的 --css 参数：按 css_uris 缓存（一次运行中只有“带 CSS / 不带 CSS”两种）
+        self._pandoc_css_args: dict[tuple, list[str]] = {}
+
     """ 检测是否安装 pandoc """
     def is_pandoc_installed(self):
-        try:
-            subprocess.run(["pandoc", "--version"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if _is_tool_installed("pandoc"):
             return True
-        except FileNotFoundError:
-            print("Pandoc is not installed, OR not found in PATH. Please install it from https://pandoc.org/installing.html, OR ensure it's added to your system PATH.")
-            return False
+        print("Pandoc is not installed, OR not found in PATH. Please install it from https://pandoc.org/installing.html, OR ensure it's added to your system PATH.")
+        return False
 
     """ 检测是否安装 wkhtmltopdf 引擎 """
     def is_wkhtmltopdf_installed(self):
-        try:
-            subprocess.run(["wkhtmltopdf", "--version"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if _is_tool_installed("wkhtmltopdf"):
             return True
-        except FileNotFoundError:
-            print("wkhtmltopdf is not installed, OR not found in PATH. Please install it from https://wkhtmltopdf.org/downloads.html, OR ensure it's added to your system PATH.")
-            return False
+        print("wkhtmltopdf is not installed, OR not found in PATH. Please install it from https://wkhtmltopdf.org/downloads.html, OR ensure it's added to your system PATH.")
+        return False
 
     """ 检测 CSS 文件是否存在 """
     def is_css_file_exists(self, css_path):
@@ -101,29 +167,37 @@ class ConvertMD:
         return Path(file_path).resolve().as_uri()
 
     """ 将 HTML 中的本地链接/图片路径重写为 file:/// URL（wkhtmltopdf 更稳定）"""
-    def rewrite_local_urls_to_file_uri(self, html: str, base_dir: Path) -> str:
+    def rewrite_local_urls_to_file_uri(
+        self,
+        html: str,
+        base_dir: Path,
+        convert_webp: bool = False,
+        missing: list[str] | None = None,
+    ) -> str:
+        # convert_webp 为 True 时顺带把本地 webp 转成 png；missing 不为 None 时收集找不到的 src
         def should_keep(url: str) -> bool:
+            # 带 scheme 或 host 的 URL 都不是本地路径：//host/x 和 \\host\x 若按本地路径解析会变成
+            # UNC 路径，在 Windows 下触发 SMB 访问（可能泄露 NTLM 凭据），因此一律原样保留
             u = url.strip()
             return (
                 u == ""
                 or u.startswith("#")
-                or u.startswith("http://")
-                or u.startswith("https://")
-                or u.startswith("data:")
-                or u.startswith("mailto:")
-                or u.startswith("file://")
+                or u.startswith("//")
+                or u.startswith("\\\\")
+                or _URL_SCHEME_RE.match(u) is not None
             )
 
         def normalize_local_path(url: str) -> str:
             # 去掉 query/fragment，并对 %xx 做反解码（常见于含空格/中文的路径）
+            # 只需要路径部分：直接按 ? / # 截断，比 urllib.parse.urlsplit 轻量，
+            # 也不会把 C:/... 的盘符误当成 URL scheme 去掉。
             u = url.strip()
-            try:
-                parsed = urllib.parse.urlsplit(u)
-                u = parsed.path
-            except Exception:
-                # 如果不是一个合法 URL，就按原样处理
-                pass
-            u = urllib.parse.unquote(u)
+            for sep in "?#":
+                i = u.find(sep)
+                if i >= 0:
+                    u = u[:i]
+            if "%" in u:
+                u = urllib.parse.unquote(u)
             return u.replace("\\", "/")
 
         def to_uri_if_exists(url: str) -> str:
@@ -132,9 +206,12 @@ class ConvertMD:
                 return url
 
             u = normalize_local_path(url)
+            # 反斜杠归一化后也可能拼出 //host/...（如 /\host\x），同样不能当本地路径
+            if u.startswith("//"):
+                return url
 
             # 绝对 Windows 路径：C:/... 或 C:\...
-            if re.match(r"^[a-zA-Z]:/", u):
+            if len(u) > 2 and u[1] == ":" and u[2] == "/" and u[0].isascii() and u[0].isalpha():
                 return Path(u).resolve().as_uri()
 
             # 相对路径：按 HTML 所在目录解析
@@ -150,136 +227,174 @@ class ConvertMD:
                     return candidate2.as_uri()
             return url
 
-        def replace_attr(match):
-            prefix = match.group(1)
-            quote = match.group(2)
-            url = match.group(3)
-            # match.group(4) 本身就是闭合引号（与 group(2) 相同），不要重复拼接，否则会得到 src="...""。
-            return f"{prefix}{quote}{to_uri_if_exists(url)}{quote}"
-
-        # src/href
-        pattern = re.compile(r"(\b(?:src|href)=)(\"|')(.*?)(\2)", re.IGNORECASE)
-        html = pattern.sub(replace_attr, html)
-
-        # srcset（可能包含多个候选：url 1x, url 2x ...）
-        def replace_srcset(match):
-            prefix = match.group(1)
-            quote = match.group(2)
-            value = match.group(3)
-
-            parts = []
+        def split_srcset(value: str) -> list[tuple[str, str]]:
+            # srcset（可能包含多个候选：url 1x, url 2x ...），返回 [(url, "2x"), ...]
+            items = []
             for item in value.split(","):
                 item = item.strip()
                 if not item:
                     continue
                 # item 形如 "path 2x" 或 "path 300w"
                 tokens = item.split()
-                url = tokens[0]
-                rest = " ".join(tokens[1:])
-                new_url = to_uri_if_exists(url)
+                items.append((tokens[0], " ".join(tokens[1:])))
+            return items
+
+        def rewrite_url(url: str, track_missing: bool) -> str:
+            new_url = resolve_url(url)
+            if new_url == url:
+                # 未被改写的本地路径即为找不到的文件（用于 Debug 输出）
+                if track_missing and missing is not None and not should_keep(url):
+                    missing.append(url)
+            # wkhtmltopdf 对 webp 支持因版本而异；浏览器能显示但 PDF 可能丢图。
+            # 这里可选把本地 webp 转成 png 再引用。
+            # 这里只登记转换任务并换成 png 的 URI，真正的解码/编码在遍历结束后并行执行。
+            if convert_webp and new_url.startswith("file:///") and new_url.lower().endswith(".webp"):
+                new_url = plan_webp(new_url)
+            return new_url
+
+        def replace_attr(match):
+            prefix = match.group(1)
+            quote = match.group(2)
+            value = match.group(3)
+            # match.group(4) 本身就是闭合引号（与 group(2) 相同），不要重复拼接，否则会得到 src="...""。
+            if not prefix.lower().startswith("srcset"):
+                return f"{prefix}{quote}{rewrite_url(value, prefix.lower() == 'src=')}{quote}"
+
+            parts = []
+            for url, rest in split_srcset(value):
+                new_url = rewrite_url(url, False)
                 parts.append((new_url + (" " + rest if rest else "")).strip())
             new_value = ", ".join(parts)
             return f"{prefix}{quote}{new_value}{quote}"
 
-        srcset_pattern = re.compile(r"(\bsrcset=)(\"|')(.*?)(\2)", re.IGNORECASE)
-        return srcset_pattern.sub(replace_srcset, html)
+        # 同一文档中重复出现的 URL（导航图标、重复插图等）只解析一次；缓存随本次调用结束而释放
+        resolve_url = functools.lru_cache(maxsize=None)(to_uri_if_exists)
+        webp_jobs: dict[Path, tuple[Path, str]] = {}
+        plan_webp = functools.lru_cache(maxsize=None)(lambda uri: self.plan_webp_to_png(uri, webp_jobs))
+
+        # 只扫描一遍：匹配结果既用于预取，也用于按位置拼接输出，不再单独调用 sub()
+        matches = list(_URL_ATTR_RE.finditer(html))
+
+        # 图片较多时，先收集所有本地 URL 并用线程池并发解析（每个都要 stat，网络盘/云盘上延迟很高），
+        # 结果直接进入上面的缓存，随后的替换只需查缓存。URL 较少的文档不值得多做这一步。
+        if len(matches) >= PREFETCH_MIN_URLS:
+            candidates = []
+            for match in matches:
+                if match.group(1).lower().startswith("srcset"):
+                    candidates.extend(url for url, _ in split_srcset(match.group(3)))
+                else:
+                    candidates.append(match.group(3))
+            candidates = [u for u in dict.fromkeys(candidates) if not should_keep(u)]
+            if len(candidates) >= PREFETCH_MIN_URLS:
+                with ThreadPoolExecutor(max_workers=min(PREFETCH_MAX_WORKERS, len(candidates))) as pool:
+                    list(pool.map(resolve_url, candidates))
+
+        # src/href/srcset 合并为一次遍历
+        if matches:
+            parts = []
+            last = 0
+            for match in matches:
+                parts.append(html[last:match.start()])
+                parts.append(replace_attr(match))
+                last = match.end()
+            parts.append(html[last:])
+            html = "".join(parts)
+
+        # 转换失败的 webp 恢复为原来的引用（一次替换处理所有失败项）
+        failed = self.convert_webp_images(webp_jobs)
+        if failed:
+            failed_re = re.compile("|".join(re.escape(uri) for uri in failed))
+            html = failed_re.sub(lambda m: failed[m.group(0)], html)
+        return html
 
-    """ 将 HTML 里的 file:///...webp 转成 png（wkhtmltopdf 对 webp 支持不稳定）"""
-    def convert_webp_images_in_html(self, html: str, html_dir: Path, temp_artifacts: list[Path]):
-        if Image is None:
-            return html
+    """ webp -> png 转换结果的缓存目录（位于目标目录下，跨文件、跨次运行复用）"""
+    def get_webp_cache_dir(self) -> Path:
+        return Path(self.target_folder) / CACHE_DIR_NAME / "webp_png"
 
-        # 仅处理 file:///... 的本地 webp
-        pattern = re.compile(r"file:///[^\"'\s>]+?\.webp", re.IGNORECASE)
-        matches = list(dict.fromkeys(pattern.findall(html)))
-        if not matches:
-            return html
+    """ 为本地 file:///...webp 登记一个转 png 的任务并返回 png 的 URI（wkhtmltopdf 对 webp 支持不稳定），不需要转换则原样返回 """
+    def plan_webp_to_png(self, uri: str, webp_jobs: dict) -> str:
+        if Image is None:
+            return uri
 
-        out_dir = html_dir / ".__wkhtml_img_tmp__"
+        out_dir = self.get_webp_cache_dir()
         try:
-            out_dir.mkdir(parents=True, exist_ok=True)
-        except OSError:
-            return html
-
-        for uri in matches:
+            # uri 形如 file:///C:/xxx.webp（由 Path.as_uri 生成，不含 query/fragment）
+            webp_path = Path(urllib.parse.unquote(uri[len("file:///"):]))
             try:
-                parsed = urllib.parse.urlsplit(uri)
-                webp_path = Path(urllib.parse.unquote(parsed.path.lstrip("/")))
-                if not webp_path.is_file():
-                    continue
+                mtime_ns = webp_path.stat().st_mtime_ns
+            except OSError:
+                return uri
+
+            # 以 (源文件绝对路径, 修改时间) 命名：同一图片被多篇 Markdown 引用时只解码一次，源图更新后自动失效
+            out_dir.mkdir(parents=True, exist_ok=True)
+            key = hashlib.sha1(str(webp_path.resolve()).encode("utf-8")).hexdigest()[:16]
+            png_path = out_dir / f"{key}_{mtime_ns}.png"
+            if not png_path.is_file():
+                webp_jobs[png_path] = (webp_path, uri)
+            return png_path.resolve().as_uri()
+        except Exception:
+            return uri
 
-                png_name = webp_path.stem + ".png"
-                png_path = out_dir / png_name
-                if not png_path.is_file():
-                    with Image.open(webp_path) as im:
-                        im.save(png_path, format="PNG")
-                temp_artifacts.append(png_path)
+    """ 并行执行 webp -> png 转换（PIL 编解码时会释放 GIL），返回失败项 {png_uri: 原 webp_uri} """
+    def convert_webp_images(self, webp_jobs: dict[Path, tuple[Path, str]]) -> dict[str, str]:
+        if not webp_jobs:
+            return {}
 
-                html = html.replace(uri, png_path.resolve().as_uri())
+        def convert(png_path: Path, webp_path: Path) -> bool:
+            # 先写临时文件再原子替换：多个进程可能同时转换同一张图片，避免读到半截的 png
+            tmp_path = png_path.with_name(f"{png_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                with Image.open(webp_path) as im:
+                    im.save(tmp_path, format="PNG")
+                os.replace(tmp_path, png_path)
             except Exception:
-                continue
+                try:
+                    tmp_path.unlink()
+                except OSError:
+                    pass
+                return False
+
+            # 缓存名为 {key}_{mtime}.png，源图片更新后旧版本不会再被引用，顺手删掉
+            key = png_path.stem.split("_", 1)[0]
+            for stale in png_path.parent.glob(f"{key}_*.png"):
+                if stale != png_path:
+                    try:
+                        stale.unlink()
+                    except OSError:
+                        pass
+            return True
 
-        # 标记输出目录，便于统一清理
-        temp_artifacts.append(out_dir)
-        return html
+        jobs = list(webp_jobs.items())
+        with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(jobs))) as pool:
+            results = list(pool.map(lambda job: convert(job[0], job[1][0]), jobs))
 
-    """ 清理 Pandoc 生成的 HTML，避免 wkhtmltopdf 因 about:blank/空链接/路径解析问题而退出 """
-    def sanitize_html_for_wkhtmltopdf(self, html_path: Path, temp_artifacts: list[Path] | None = None):
-        try:
-            html = html_path.read_text(encoding="utf-8")
-        except OSError:
-            return
+        failed = {}
+        for (png_path, (_, uri)), ok in zip(jobs, results):
+            if not ok:
+                failed[png_path.resolve().as_uri()] = uri
+        return failed
 
+    """ 清理 Pandoc 生成的 HTML 字符串，避免 wkhtmltopdf 因 about:blank/空链接/路径解析问题而退出 """
+    def sanitize_html_string(self, html: str, base_dir: Path, name: str = "HTML") -> str:
         # 常见触发点：Markdown 里出现 []() 这类空链接，会生成 href=""，wkhtmltopdf 可能将其当作 about:blank 去加载并报错。
-        html = html.replace('href=""', 'href="#"')
-        html = html.replace("href=''", "href='#'")
-        html = html.replace('src=""', 'src="#"')
-        html = html.replace("src=''", "src='#'")
-
         # 另一个触发点：部分内容/模板会直接出现 about:blank（iframe、链接占位等）
         # wkhtmltopdf 会报 Protocol "about" is unknown 并直接退出
-        html = html.replace("about:blank", "#")
-
-        # 让 wkhtmltopdf 更稳定地加载本地图片/链接：统一重写为 file:/// URL
-        html = self.rewrite_local_urls_to_file_uri(html, html_path.parent)
-
-        # wkhtmltopdf 对 webp 支持因版本而异；浏览器能显示但 PDF 可能丢图。
-        # 这里可选把本地 webp 转成 png 再引用。
-        if temp_artifacts is not None:
-            html = self.convert_webp_images_in_html(html, html_path.parent, temp_artifacts)
+        # 两者合并为一次遍历：空属性改为 "#"（保留原引号），about:blank 直接替换为 "#"
+        html = _EMPTY_ATTR_RE.sub(
+            lambda m: f"{m.group(1)}={m.group(2)[0]}#{m.group(2)[0]}" if m.group(1) else "#",
+            html,
+        )
 
+        # 让 wkhtmltopdf 更稳定地加载本地图片/链接：统一重写为 file:/// URL（同一遍顺带处理 webp）
         # Debug：统计仍然找不到的本地图片（仅在 keep_html_on_success 打开时输出，避免刷屏）
-        if self.keep_html_on_success:
-            missing = []
-            for m in re.finditer(r"<img\b[^>]*\bsrc=(\"|')([^\"']+)(\1)", html, re.IGNORECASE):
-                src = m.group(2)
-                # 只关注本地路径（非 http/https/data/file）
-                if src.startswith(("http://", "https://", "data:", "file://")):
-                    continue
-                u = src.strip()
-                try:
-                    parsed = urllib.parse.urlsplit(u)
-                    u = parsed.path
-                except Exception:
-                    pass
-                u = urllib.parse.unquote(u).replace("\\", "/")
-                if not u:
-                    continue
-                p = (html_path.parent / u).resolve()
-                if not p.is_file() and u.startswith("/"):
-                    p = (html_path.parent / u.lstrip("/")).resolve()
-                if not p.is_file():
-                    missing.append(src)
-
-            if missing:
-                print(f"Warning: {html_path.name} still has {len(missing)} missing <img src=...> after rewrite.")
-                for item in missing[:10]:
-                    print(f"  - {item}")
+        missing: list[str] | None = [] if self.keep_html_on_success else None
+        html = self.rewrite_local_urls_to_file_uri(html, base_dir, True, missing)
 
-        try:
-            html_path.write_text(html, encoding="utf-8", newline="\n")
-        except OSError:
-            return
+        if missing:
+            print(f"Warning: {name} still has {len(missing)} missing src=... after rewrite.")
+            for item in missing[:10]:
+                print(f"  - {item}")
+        return html
 
     """ 获取 CSS 的 file:/// URL（不存在则返回 None）"""
     def get_css_uri(self):
@@ -298,83 +413,319 @@ class ConvertMD:
         return None
 
     """ 遍历目标目录下所有 Markdown 文件 """
-    def iter_markdown_files(self):
-        # root: 当前遍历的目录路径
-        # _: 忽略子目录名列表，即 dirs，这里不需要，用 _ 表示“不关心”
-        # files: 当前 root 目录下的文件名列表
-        for root, _, files in os.walk(self.target_folder):
-            for file in files:
-                if file.endswith(".md"):
-                    yield Path(root) / file  # 拼接路径, 比 os.path.join 更现代、可读性更强。返回
+    def iter_markdown_files(self, folder=None):
+        # 用 os.scandir 手动递归：DirEntry 自带文件类型信息，大多数情况下无需额外 stat；
+        # 同时可以整棵剪掉 .git / node_modules / 缓存目录等不需要遍历的子树（网络盘上尤其明显）。
+        folder = self.target_folder if folder is None else folder
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except OSError:
+            return
+
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not (entry.name.startswith(".") or entry.name in SKIP_DIR_NAMES):
+                    subdirs.append(entry.path)
+            elif entry.name.endswith(".md") and entry.is_file():
+                yield Path(entry.path)  # 拼接好的路径, 比 os.path.join 更现代、可读性更强。返回
+        for subdir in subdirs:
+            yield from self.iter_markdown_files(subdir)
 
     """ Windows 下兜底：若输入不是 UTF-8，则转码成临时 UTF-8 Markdown，返回 Pandoc 实际输入路径 """
     def ensure_utf8_markdown(self, input_path: Path, md_tmp_path: Path) -> Path:
+        # 常见情况是文件本身就是 UTF-8：只分块校验，不把整个文件读进内存；
+        # 确认不是 UTF-8 时才完整读取并转码。
         try:
-            raw = input_path.read_bytes()
+            with input_path.open("rb") as f:
+                # 带 UTF-8 BOM：只看开头几个字节即可
+                if f.read(3) == b"\xef\xbb\xbf":
+                    return input_path
+                f.seek(0)
+                decoder = codecs.getincrementaldecoder("utf-8")()
+                while True:
+                    chunk = f.read(UTF8_CHECK_CHUNK_SIZE)
+                    if not chunk:
+                        decoder.decode(b"", final=True)
+                        return input_path
+                    # 纯 ASCII（UTF-8 的子集）且没有跨块的半个字符时，不必解码
+                    if not (chunk.isascii() and not decoder.getstate()[0]):
+                        decoder.decode(chunk)
+        except UnicodeDecodeError:
+            pass
         except OSError:
             return input_path
 
         try:
-            raw.decode("utf-8")
+            raw = input_path.read_bytes()
+        except OSError:
             return input_path
-        except UnicodeDecodeError:
-            pass
 
-        # 尝试常见编码：utf-8-sig / gb18030
-        try:
-            text = raw.decode("utf-8-sig")
-        except UnicodeDecodeError:
-            text = raw.decode("gb18030")
+        # 不是 UTF-8（BOM 的情况上面已处理），按 Windows 下常见的 gb18030 解码
+        text = raw.decode("gb18030")
 
         md_tmp_path.write_text(text, encoding="utf-8", newline="\n")
         return md_tmp_path
 
-    """ 运行外部命令（捕获输出，避免控制台编码导致崩溃）"""
-    def run_command(self, cmd):
-        return subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    """ 运行外部命令（捕获 stdout，避免控制台编码导致崩溃；stderr 默认丢弃，需要诊断时再捕获）"""
+    def run_command(self, cmd, input=None, capture_stderr=False):
+        # wkhtmltopdf 会输出大量进度/警告信息，成功时用不到，直接丢弃以免无谓地读取管道
+        stderr = subprocess.PIPE if capture_stderr else subprocess.DEVNULL
+        return subprocess.run(cmd, check=True, input=input, stdout=subprocess.PIPE, stderr=stderr)
+
+    """ 组装 Pandoc 的 --css 参数（结果按 css_uris 缓存，避免每个文件重复拼接）"""
+    def build_pandoc_css_args(self, css_uris) -> list[str]:
+        key = tuple(css_uris or [])
+        if key not in self._pandoc_css_args:
+            # --css：如果提供 CSS，则以 file:/// URL 引用，方便 wkhtmltopdf 读取本地资源
+            self._pandoc_css_args[key] = [f"--css={uri}" for uri in key if uri]
+        return self._pandoc_css_args[key]
 
     """ 组装 Pandoc 命令：md -> html """
-    def build_pandoc_cmd(self, input_md: Path, html_path: Path, title: str, css_uris):
+    def build_pandoc_cmd(self, input_md: Path, title: str, css_uris):
         # 说明：
+        # - -o -：HTML 输出到 stdout，在内存中清理后只写一次文件
         # - --standalone：输出完整 HTML（包含 <head> 等）
         # - --metadata pagetitle=...：避免标题为空导致的某些警告
-        # - --css：如果提供 CSS，则以 file:/// URL 引用，方便 wkhtmltopdf 读取本地资源
+        # - --css：见 build_pandoc_css_args
         cmd = [
             "pandoc",
             str(input_md),
             "-o",
-            str(html_path),
+            "-",
             "--standalone",
             "--metadata",
             "pagetitle=" + title,
+            *self.build_pandoc_css_args(css_uris),
         ]
-        for uri in (css_uris or []):
-            if uri:
-                cmd.append(f"--css={uri}")
         return cmd
 
-    """ 组装 wkhtmltopdf 命令：html -> pdf """
-    def build_wkhtmltopdf_cmd(self, html_path: Path, output_pdf: Path):
+    """ 组装 Pandoc 批量命令：多个 md -> 一份 HTML（输出到 stdout，随后按分隔符拆分）"""
+    def build_pandoc_batch_cmd(self, input_mds, separator_md: Path, title: str, css_uris):
         # 说明：
-        # - --enable-local-file-access：允许加载本地图片/CSS/字体（Windows 下非常关键）
-        # - --encoding utf-8：避免中文在部分环境下出现乱码
-        # - --print-media-type：更接近 Typora/浏览器“打印”的排版
-        # - --disable-smart-shrinking：避免字号/布局被自动缩放导致和 Typora 差异过大
-        return [
-            "wkhtmltopdf",
-            "--enable-local-file-access",
-            # CSS 里引用的本地字体/图片缺失时，默认会导致 wkhtmltopdf 直接失败退出
-            # 这里改为忽略加载错误，让转换尽可能产出 PDF（样式缺失会在控制台警告）
-            "--load-error-handling",
-            "ignore",
-            "--load-media-error-handling",
-            "ignore",
-            "--encoding",
-            "utf-8",
-            *self.wkhtmltopdf_style_args,
-            str(html_path),
-            str(output_pdf),
+        # - 每两个输入之间插入只含分隔注释的 Markdown，Pandoc 会把它原样写进 HTML
+        # - --file-scope：逐个文件解析后再合并，避免脚注/链接引用/标题 id 在文件之间串台
+        #   （Pandoc 3.x 还会给每个文件包一层 div 并给 id 加文件前缀，拆分时见 split_batch_html）
+        # - 不指定 -o：HTML 输出到 stdout，直接在内存中拆分
+        cmd = ["pandoc"]
+        for i, input_md in enumerate(input_mds):
+            if i:
+                cmd.append(str(separator_md))
+            cmd.append(str(input_md))
+        cmd += [
+            "--file-scope",
+            "--standalone",
+            "--metadata",
+            "pagetitle=" + title,
+            *self.build_pandoc_css_args(css_uris),
         ]
+        return cmd
+
+    """ 将批量输出的 HTML 拆回每个文件各自的完整 HTML；无法拆分返回 None，单个文档无法拆分对应位置为 None """
+    def split_batch_html(self, html: str, titles: list[str]):
+        parts = html.split(BATCH_SEPARATOR)
+        if len(parts) != len(titles):
+            return None
+
+        body_open = _BODY_OPEN_RE.search(parts[0])
+        body_close = parts[-1].rfind("</body>")
+        if body_open is None or body_close < 0:
+            return None
+
+        head = parts[0][: body_open.end()]
+        tail = parts[-1][body_close:]
+        parts[0] = parts[0][body_open.end():]
+        parts[-1] = parts[-1][:body_close]
+
+        # 兜底：YAML 元数据里的 title 会被合并成整批共用的标题块，无法归属到具体文件
+        if 'id="title-block-header"' in parts[0]:
+            return None
+
+        # Pandoc 3.x：分隔注释位于分隔文件自己的包裹 div 中，先去掉它，再把每个文件的包裹 div 和 id 前缀还原；
+        # Pandoc 2.x 原样输出分隔注释，各段即为文件内容
+        if _WRAPPER_OPEN_TAIL_RE.search(parts[0]):
+            parts = self.strip_separator_wrappers(parts)
+            if parts is None:
+                return None
+            bodies = self.unwrap_file_scope_bodies(parts)
+        else:
+            bodies = parts
+
+        docs = []
+        for i, (title, body) in enumerate(zip(titles, bodies)):
+            # 脚注统一输出在整份 HTML 末尾（即最后一段），含脚注的文档和最后一个文档交给逐个转换
+            if body is None or 'class="footnote-ref"' in body or (i == len(bodies) - 1 and 'class="footnotes' in body):
+                docs.append(None)
+                continue
+            doc_head = _TITLE_RE.sub(lambda _: f"<title>{html_escape(title)}</title>", head, count=1)
+            docs.append(doc_head + body + tail)
+        return docs
+
+    """ 去掉各段首尾属于分隔文件的包裹 div（</div> 开头、<div id="..."> 结尾），结构不符返回 None """
+    def strip_separator_wrappers(self, parts: list[str]):
+        stripped = []
+        for i, part in enumerate(parts):
+            if i > 0:
+                m = _WRAPPER_CLOSE_HEAD_RE.match(part)
+                if m is None:
+                    return None
+                part = part[m.end():]
+            if i < len(parts) - 1:
+                m = _WRAPPER_OPEN_TAIL_RE.search(part)
+                if m is None:
+                    return None
+                part = part[: m.start()]
+            stripped.append(part)
+        return stripped
+
+    """ 去掉每个文件的包裹 div，并把 "<文件标识>__" 前缀从 id 和 #锚点链接中还原，使结果与单独转换一致；无法还原的位置为 None """
+    def unwrap_file_scope_bodies(self, parts: list[str]) -> list[str | None]:
+        bodies: list[str | None] = []
+        file_ids = []
+        for part in parts:
+            m = _WRAPPER_OPEN_HEAD_RE.match(part)
+            # 最后一段的包裹 div 之后可能还跟着整份文档的脚注，这种文档本来就要逐个转换
+            end = part.rfind("</div>")
+            if m is None or not m.group(1) or end < m.end() or part[end + len("</div>"):].strip():
+                bodies.append(None)
+                continue
+            file_id = m.group(1)
+            file_ids.append(file_id)
+            body = part[m.end():end]
+            body = body.replace(f'id="{file_id}__', 'id="').replace(f'href="#{file_id}__', 'href="#')
+            bodies.append(body)
+
+        # 指向批内文件的链接（a.md、b.md#x）已被改写成 #<文件标识>，单独转换时不会这样，交给逐个转换
+        for i, body in enumerate(bodies):
+            if body is not None and any(f'href="#{file_id}' in body for file_id in file_ids):
+                bodies[i] = None
+        return bodies
+
+    """ 检测 Markdown 是否以 YAML 元数据块开头（批量模式下 Pandoc 会把各文件的元数据合并，不能共用）"""
+    def has_yaml_front_matter(self, md_path: Path) -> bool:
+        try:
+            with md_path.open("rb") as f:
+                first_line = f.readline(64)
+        except OSError:
+            return False
+        if first_line.startswith(b"\xef\xbb\xbf"):
+            first_line = first_line[3:]
+        return first_line.rstrip() == b"---"
+
+    """ 用一次 Pandoc 调用渲染一组文件；失败时二分重试，把出错的文件隔离出来交给逐个转换 """
+    def render_html_chunk(self, chunk: list[Path], inputs: dict[Path, Path], separator_md: Path, css_uris, rendered: dict[Path, str]):
+        # inputs：{md_path: 实际交给 Pandoc 的 UTF-8 文件}，见 render_html_batch
+        if len(chunk) < 2:
+            return
+        cmd = self.build_pandoc_batch_cmd([inputs[p] for p in chunk], separator_md, chunk[0].stem, css_uris)
+        try:
+            html = self.run_command(cmd).stdout.decode("utf-8")
+        except (subprocess.CalledProcessError, UnicodeDecodeError):
+            # 某个文件导致整批失败：拆成两半分别重试，最终只有出错的文件回退为逐个转换
+            mid = len(chunk) // 2
+            self.render_html_chunk(chunk[:mid], inputs, separator_md, css_uris, rendered)
+            self.render_html_chunk(chunk[mid:], inputs, separator_md, css_uris, rendered)
+            return
+
+        docs = self.split_batch_html(html, [p.stem for p in chunk])
+        if docs is None:
+            return
+        for md_path, doc in zip(chunk, docs):
+            if doc is not None:
+                rendered[md_path] = doc
+
+    """ 用尽量少的 Pandoc 进程把多个 Markdown 转为 HTML，返回 {md_path: html}；未包含的文件需逐个转换 """
+    def render_html_batch(self, md_paths: list[Path], css_uris) -> dict[Path, str]:
+        rendered: dict[Path, str] = {}
+        if len(md_paths) < 2:
+            return rendered
+
+        fd, separator_name = tempfile.mkstemp(prefix="convert_md_sep_", suffix=".md")
+        separator_md = Path(separator_name)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+                f.write(f"\n{BATCH_SEPARATOR}\n")
+
+            # 带 YAML 元数据（header-includes/lang/css/title 等）的文件不参与批量，避免元数据串到其他文件
+            # 编码无法识别（既不是 UTF-8 也不是 GB18030）或无法转码的文件同样不参与，交给逐个转换时报错
+            inputs: dict[Path, Path] = {}
+            for md_path in md_paths:
+                if self.has_yaml_front_matter(md_path):
+                    continue
+                try:
+                    inputs[md_path] = self.ensure_utf8_markdown(md_path, self.get_temp_paths(md_path)[1])
+                except (UnicodeDecodeError, OSError):
+                    continue
+            batchable = list(inputs)
+            for start in range(0, len(batchable), BATCH_SIZE):
+                self.render_html_chunk(batchable[start : start + BATCH_SIZE], inputs, separator_md, css_uris, rendered)
+        finally:
+            try:
+                separator_md.unlink()
+            except OSError:
+                pass
+        return rendered
+
+    """ 组装 wkhtmltopdf 命令：html -> pdf """
+    def build_wkhtmltopdf_cmd(self, html_path: Path, output_pdf: Path):
+        # 固定参数见 __init__ 中的 _wkhtml_cmd_prefix
+        return [*self._wkhtml_cmd_prefix, str(html_path), str(output_pdf)]
+
+    """ 组装 wkhtmltopdf --read-args-from-stdin 模式下的一行参数（含空格/中文路径需加引号转义）"""
+    def build_wkhtmltopdf_stdin_line(self, html_path: Path, output_pdf: Path) -> str:
+        args = self.build_wkhtmltopdf_cmd(html_path, output_pdf)[1:]
+        return " ".join('"' + a.replace("\\", "\\\\").replace('"', '\\"') + '"' for a in args)
+
+    """ 用同一个 wkhtmltopdf 进程转换多个 HTML，返回成功生成 PDF 的 Markdown 路径集合 """
+    def run_wkhtmltopdf_batch(self, md_paths: list[Path]) -> set[Path]:
+        if len(md_paths) < 2:
+            return set()
+
+        # --read-args-from-stdin：每行一组参数，共享同一个进程（QtWebKit 启动、字体缓存只初始化一次）
+        # 先输出到临时 PDF，再按是否生成来判断每个文件的成败（批量模式下退出码无法对应到具体文件）
+        jobs = []
+        lines = []
+        for md_path in md_paths:
+            html_path, _ = self.get_temp_paths(md_path)
+            tmp_pdf = md_path.with_name(md_path.stem + ".__wkhtml_tmp__.pdf")
+            # 之前中断的运行可能留下同名临时 PDF，必须先删掉，否则会被误判为本次转换成功
+            try:
+                tmp_pdf.unlink(missing_ok=True)
+            except OSError:
+                continue
+            jobs.append((md_path, tmp_pdf))
+            lines.append(self.build_wkhtmltopdf_stdin_line(html_path, tmp_pdf))
+
+        try:
+            self.run_command(["wkhtmltopdf", "--read-args-from-stdin"], input="\n".join(lines).encode("utf-8") + b"\n")
+        except subprocess.CalledProcessError:
+            # 部分文件失败也会导致非零退出码，这里按实际产物判断
+            pass
+
+        converted = set()
+        for md_path, tmp_pdf in jobs:
+            try:
+                if tmp_pdf.is_file() and tmp_pdf.stat().st_size > 0:
+                    os.replace(tmp_pdf, md_path.with_suffix(".pdf"))
+                    converted.add(md_path)
+                elif tmp_pdf.is_file():
+                    tmp_pdf.unlink()
+            except OSError:
+                pass
+        return converted
+
+    """ 获取失败命令的错误信息：已捕获 stderr 则直接用；否则（Pandoc）带 stderr 重跑一次失败的命令 """
+    def get_error_details(self, err: subprocess.CalledProcessError) -> str:
+        err_bytes = err.stderr
+        if err_bytes is None:
+            try:
+                self.run_command(err.cmd, capture_stderr=True)
+            except subprocess.CalledProcessError as rerun_err:
+                err_bytes = rerun_err.stderr
+            except OSError:
+                pass
+        return self.decode_stderr(err_bytes)
 
     """ 将异常 stderr 解码成人类可读文本 """
     def decode_stderr(self, err_bytes) -> str:
@@ -389,93 +740,170 @@ class ConvertMD:
             except Exception:
                 return str(err_bytes)
 
-    """ 转换单个 Markdown 文件，成功返回 True """
-    def convert_one_file(self, md_path: Path, css_uris) -> bool:
-        file_name_no_ext = md_path.stem
-        output_pdf = md_path.with_suffix(".pdf")
-
+    """ 获取单个 Markdown 对应的临时文件路径：(html_path, md_tmp_path) """
+    def get_temp_paths(self, md_path: Path):
         # 生成临时文件（放在 Markdown 同目录，保证相对图片/资源路径可用）
-        # html_path = md_path.with_name(file_name_no_ext + ".__pandoc_tmp__.html")
-        html_path = md_path.with_name(file_name_no_ext + ".html")
-        md_tmp_path = md_path.with_name(file_name_no_ext + ".__pandoc_tmp__.md")
+        # html_path = md_path.with_name(md_path.stem + ".__pandoc_tmp__.html")
+        html_path = md_path.with_name(md_path.stem + ".html")
+        md_tmp_path = md_path.with_name(md_path.stem + ".__pandoc_tmp__.md")
+        return html_path, md_tmp_path
+
+    """ 生成并清理 HTML 并写入文件，返回清理后的 HTML（html 为批量模式下已由 Pandoc 生成的 HTML，此时跳过 Pandoc）"""
+    def prepare_html(self, md_path: Path, css_uris, html: str | None = None):
+        html_path, md_tmp_path = self.get_temp_paths(md_path)
+        if html is None:
+            # Windows 下经常会遇到 Markdown 文件不是 UTF-8（例如 GBK/GB18030）
+            # Pandoc 默认按 UTF-8 读取，遇到非 UTF-8 会直接报错。
+            # 这里做一个温和的兜底：如果检测到不是 UTF-8，则先转码到临时 UTF-8 文件再喂给 Pandoc。
+            pandoc_input = self.ensure_utf8_markdown(md_path, md_tmp_path)
+            html = self.run_command(self.build_pandoc_cmd(pandoc_input, md_path.stem, css_uris)).stdout.decode("utf-8")
+        # wkhtmltopdf 对 about:blank 等非常敏感，先在内存中对 HTML 做一次清理，再写入文件
+        html = self.sanitize_html_string(html, md_path.parent, html_path.name)
+        html_path.write_text(html, encoding="utf-8", newline="\n")
+        return html
 
-        # Windows 下经常会遇到 Markdown 文件不是 UTF-8（例如 GBK/GB18030）
-        # Pandoc 默认按 UTF-8 读取，遇到非 UTF-8 会直接报错。
-        # 这里做一个温和的兜底：如果检测到不是 UTF-8，则先转码到临时 UTF-8 文件再喂给 Pandoc。
-        pandoc_input = self.ensure_utf8_markdown(md_path, md_tmp_path)
+    """ 去掉 HTML 中引用 css_uris 的 <link> 标签（用于不带 CSS 重试）"""
+    def strip_css_links(self, html: str, css_uris) -> str:
+        uris = [u for u in (css_uris or []) if u]
+        if not uris:
+            return html
+        link_re = re.compile(
+            r"<link\b[^>]*\bhref=(\"|')(?:" + "|".join(re.escape(u) for u in uris) + r")\1[^>]*>\s*",
+            re.IGNORECASE,
+        )
+        return link_re.sub("", html)
+
+    """ 判断 wkhtmltopdf 的失败是否与 CSS/字体有关（只有这类失败才值得不带 CSS 重试）"""
+    def is_css_related_error(self, details: str) -> bool:
+        # 只看 Error 行：进度/警告行里常带着我们自己的 whitey_plus.css 路径，不能据此判断
+        for line in details.splitlines():
+            lowered = line.strip().lower()
+            if lowered.startswith("error") and ("css" in lowered or "font" in lowered):
+                return True
+        return False
+
+    """ 清理单个文件的临时产物：成功时删除，失败时保留以便排查 """
+    def cleanup_temp_files(self, md_path: Path, success: bool):
+        html_path, md_tmp_path = self.get_temp_paths(md_path)
+        # 仅在成功时清理临时文件；失败时保留，便于你排查（比如打开 HTML 看看哪里触发了 wkhtmltopdf 报错）
+        try:
+            if success:
+                if html_path.is_file():
+                    if self.keep_html_on_success:
+                        print(f"已保留临时 HTML（keep_html_on_success=True）: {html_path}")
+                    else:
+                        html_path.unlink()
+                if md_tmp_path.is_file():
+                    md_tmp_path.unlink()
+            else:
+                if html_path.is_file():
+                    print(f"已保留临时 HTML 以便排查: {html_path}")
+                if md_tmp_path.is_file():
+                    print(f"已保留临时 Markdown 以便排查: {md_tmp_path}")
+        except OSError:
+            pass
+
+    """ 转换单个 Markdown 文件，成功返回 True
+    html 为批量模式下已由 Pandoc 生成的 HTML（此时跳过 Pandoc）；prepared=True 表示 html 已清理并写入文件（此时直接调用 wkhtmltopdf）"""
+    def convert_one_file(self, md_path: Path, css_uris, html: str | None = None, prepared: bool = False) -> bool:
+        output_pdf = md_path.with_suffix(".pdf")
+        html_path, _ = self.get_temp_paths(md_path)
 
         # 折中方案：
         # 1) 先用 Pandoc 把 Markdown 转为 HTML
         # 2) 再用 wkhtmltopdf 把 HTML 转为 PDF
         # 这样一般比“Pandoc 直接调用 PDF 引擎”更可控，也更接近浏览器渲染效果。
-        pandoc_cmd = self.build_pandoc_cmd(pandoc_input, html_path, file_name_no_ext, css_uris)
         wkhtml_cmd = self.build_wkhtmltopdf_cmd(html_path, output_pdf)
 
-        print(f"正在转换: {md_path.name} -> {output_pdf} ...")
+        if not prepared:
+            print(f"正在转换: {md_path.name} -> {output_pdf} ...")
 
         success = False
-        temp_artifacts: list[Path] = []
         try:
             # 1. Markdown -> HTML
-            self.run_command(pandoc_cmd)
-            # wkhtmltopdf 对 about:blank 等非常敏感，先对 HTML 做一次清理
-            self.sanitize_html_for_wkhtmltopdf(html_path, temp_artifacts)
+            if not prepared:
+                html = self.prepare_html(md_path, css_uris, html)
 
             # 2. HTML -> PDF
             try:
-                self.run_command(wkhtml_cmd)
+                # 逐个转换本身就是批量失败后的诊断路径：直接捕获 stderr，失败时据此判断原因，
+                # 不能再靠 get_error_details 重跑一遍整个渲染（重跑只留给 Pandoc）
+                self.run_command(wkhtml_cmd, capture_stderr=True)
                 success = True
             except subprocess.CalledProcessError as wk_err:
                 # 经验：wkhtmltopdf 在某些 CSS/字体场景下会失败。
-                # 这里做一个兜底：失败后尝试不带 CSS 再跑一次（保证尽量产出 PDF）。
-                if css_uris:
+                # 这里做一个兜底：若错误与 CSS/字体有关，去掉 CSS 引用后再跑一次（保证尽量产出 PDF）。
+                # 直接改写已清理好的 HTML，不必重新调用 Pandoc 和清理；其他原因的失败重试也无济于事，直接报错。
+                if css_uris and self.is_css_related_error(self.decode_stderr(wk_err.stderr)):
                     print("wkhtmltopdf failed with CSS; retrying once without CSS...")
-                    pandoc_cmd_no_css = self.build_pandoc_cmd(pandoc_input, html_path, file_name_no_ext, [])
-                    self.run_command(pandoc_cmd_no_css)
-                    self.sanitize_html_for_wkhtmltopdf(html_path, temp_artifacts)
-                    self.run_command(wkhtml_cmd)
+                    html_path.write_text(self.strip_css_links(html, css_uris), encoding="utf-8", newline="\n")
+                    self.run_command(wkhtml_cmd, capture_stderr=True)
                     success = True
                 else:
                     raise wk_err
         except subprocess.CalledProcessError as e:
-            details = self.decode_stderr(getattr(e, "stderr", b""))
+            details = self.get_error_details(e)
             if details:
                 print(f"转换失败: {md_path.name}, 错误: {e}\n{details}")
             else:
                 print(f"转换失败: {md_path.name}, 错误: {e}")
+        except OSError as e:
+            # 例如临时 HTML 路径被占用（同名目录、只读等），只算这一个文件失败
+            print(f"转换失败: {md_path.name}, 错误: {e}")
+        except UnicodeDecodeError as e:
+            # Markdown 既不是 UTF-8 也不是 GB18030（或 Pandoc 输出无法解码），只算这一个文件失败
+            print(f"转换失败: {md_path.name}, 无法识别的文件编码: {e}")
         finally:
-            # 仅在成功时清理临时文件；失败时保留，便于你排查（比如打开 HTML 看看哪里触发了 wkhtmltopdf 报错）
-            try:
-                if success:
-                    if html_path.is_file():
-                        if self.keep_html_on_success:
-                            print(f"已保留临时 HTML（keep_html_on_success=True）: {html_path}")
-                        else:
-                            html_path.unlink()
-                    if md_tmp_path.is_file():
-                        md_tmp_path.unlink()
-
-                    # 清理由 webp->png 转换产生的临时资源（除非用户要求保留 HTML）
-                    if not self.keep_html_on_success:
-                        for p in sorted(set(temp_artifacts), key=lambda x: len(str(x)), reverse=True):
-                            try:
-                                if p.is_file():
-                                    p.unlink()
-                                elif p.is_dir():
-                                    # 目录只在空时删除
-                                    p.rmdir()
-                            except OSError:
-                                pass
-                else:
-                    if html_path.is_file():
-                        print(f"已保留临时 HTML 以便排查: {html_path}")
-                    if md_tmp_path.is_file():
-                        print(f"已保留临时 Markdown 以便排查: {md_tmp_path}")
-            except OSError:
-                pass
+            self.cleanup_temp_files(md_path, success)
 
         return success
 
+    """ 批量转换：Pandoc/wkhtmltopdf 各自尽量只启动一次，失败的文件再逐个转换，返回成功数量 """
+    def convert_batch(self, md_paths: list[Path], css_uris) -> int:
+        # 先用尽量少的 Pandoc 进程批量生成 HTML（进程启动开销远大于小文件本身的转换），
+        # 批量失败或无法拆分的文件再逐个调用 Pandoc。
+        rendered = self.render_html_batch(md_paths, css_uris)
+
+        prepared: dict[Path, str] = {}
+        for md_path in md_paths:
+            if md_path not in rendered:
+                continue
+            print(f"正在转换: {md_path.name} -> {md_path.with_suffix('.pdf')} ...")
+            try:
+                prepared[md_path] = self.prepare_html(md_path, css_uris, rendered[md_path])
+            except OSError as e:
+                # 写临时 HTML 失败只影响这一个文件，不能让整组（乃至整个进程池）中断
+                print(f"转换失败: {md_path.name}, 错误: {e}")
+                self.cleanup_temp_files(md_path, False)
+
+        # 已就绪的 HTML 交给同一个 wkhtmltopdf 进程
+        converted = self.run_wkhtmltopdf_batch(list(prepared))
+
+        count = 0
+        for md_path in md_paths:
+            if md_path in converted:
+                self.cleanup_temp_files(md_path, True)
+                count += 1
+            elif md_path in prepared:
+                # 批量中失败的文件：HTML 已清理并写好，只需单独重跑 wkhtmltopdf
+                if self.convert_one_file(md_path, css_uris, prepared[md_path], prepared=True):
+                    count += 1
+            elif md_path not in rendered and self.convert_one_file(md_path, css_uris):
+                count += 1
+        return count
+
+    """ 按文件把列表切成至多 n 个连续、大小相近的组（保持遍历顺序，同目录文件多半落在同一组）"""
+    def split_into_chunks(self, md_paths: list[Path], n: int) -> list[list[Path]]:
+        n = max(1, min(n, len(md_paths)))
+        size, extra = divmod(len(md_paths), n)
+        chunks: list[list[Path]] = []
+        start = 0
+        for i in range(n):
+            end = start + size + (1 if i < extra else 0)
+            chunks.append(md_paths[start:end])
+            start = end
+        return [c for c in chunks if c]
+
     """ 执行转换 """
     def convert(self):
         if not self.check_prerequisites():
@@ -486,9 +914,27 @@ class ConvertMD:
         css_uris = [u for u in [css_uri, compat_css_uri] if u]
         print(f"Converting markdown files in folder: {self.target_folder}")
 
-        count = 0
-        for md_path in self.iter_markdown_files():
-            if self.convert_one_file(md_path, css_uris):
-                count += 1
+        # 各文件相互独立，分组并行；每组内部仍走批量 Pandoc/wkhtmltopdf。
+        # 每组至少约 BATCH_SIZE 个文件才值得多开一个进程：组太小时批量失去意义，还要白付进程池启动开销，
+        # 所以文件不多时直接在当前进程里转换。
+        md_paths = list(self.iter_markdown_files())
+        workers = min(os.cpu_count() or 1, MAX_WORKERS, (len(md_paths) + BATCH_SIZE - 1) // BATCH_SIZE)
+        chunks = self.split_into_chunks(md_paths, workers)
+        if len(chunks) <= 1:
+            count = self.convert_batch(md_paths, css_uris)
+        else:
+            count = 0
+            with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+                futures = {pool.submit(self.convert_batch, chunk, css_uris): chunk for chunk in chunks}
+                for future, chunk in futures.items():
+                    # 某一组抛出异常时只影响该组，其余组照常汇总；
+                    # 但工作进程被强制终止（崩溃、被系统杀掉）时整个进程池失效，所有尚未完成的组都会失败
+                    names = ", ".join(p.name for p in chunk)
+                    try:
+                        count += future.result()
+                    except BrokenProcessPool:
+                        print(f"转换中断: 工作进程异常退出，该组 {len(chunk)} 个文件结果未知 ({names})")
+                    except Exception as e:
+                        print(f"转换失败: 该组 {len(chunk)} 个文件未完成 ({names}): {e}")
 
         print(f"\n处理完成！共转换了 {count} 个文件。")
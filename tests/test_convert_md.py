@@ -0,0 +1,137 @@
+import shlex
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from convert_md import BATCH_SEPARATOR, ConvertMD  # noqa: E402
+
+
+HEAD = """<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" lang="" xml:lang="">
+<head>
+  <meta charset="utf-8" />
+  <meta name="generator" content="pandoc" />
+  <meta name="viewport" content="width=device-width, initial-scale=1.0, user-scalable=yes" />
+  <title>a</title>
+  <link rel="stylesheet" href="file:///C:/Convert-md/assets/whitey_plus.css" />
+</head>
+<body>
+"""
+TAIL = """</body>
+</html>
+"""
+
+# Pandoc 3.x：pandoc a.md sep.md sub/b.md --file-scope --standalone
+# 每个输入（包括分隔文件）包一层以文件标识为 id 的 div，文件内的 id 和 #锚点链接加上 "<文件标识>__" 前缀
+PANDOC3_BATCH = HEAD + f"""<div id="a.md">
+<h1 id="a.md__intro">Intro</h1>
+<p>See <a href="#a.md__intro">intro</a>.</p>
+</div>
+<div id="tmp__convert_md_sep_x1y2.md">
+{BATCH_SEPARATOR}
+</div>
+<div id="sub__b.md">
+<h1 id="sub__b.md__intro">Intro</h1>
+<p>Hello</p>
+</div>
+""" + TAIL
+
+# Pandoc 2.x：同样的命令，分隔注释原样出现在两个文件之间
+PANDOC2_BATCH = HEAD + f"""<h1 id="intro">Intro</h1>
+<p>See <a href="#intro">intro</a>.</p>
+{BATCH_SEPARATOR}
+<h1 id="intro">Intro</h1>
+<p>Hello</p>
+""" + TAIL
+
+
+class SplitBatchHtmlTest(unittest.TestCase):
+    def setUp(self):
+        self.converter = ConvertMD(".")
+
+    def body_of(self, doc):
+        return doc[doc.index("<body>") + len("<body>"): doc.index("</body>")]
+
+    def test_pandoc3_file_scope_wrappers_and_prefixes_are_removed(self):
+        docs = self.converter.split_batch_html(PANDOC3_BATCH, ["a", "b"])
+        self.assertEqual(len(docs), 2)
+        a, b = docs
+        self.assertIn("<title>a</title>", a)
+        self.assertIn("<title>b</title>", b)
+        self.assertEqual(
+            self.body_of(a).strip(),
+            '<h1 id="intro">Intro</h1>\n<p>See <a href="#intro">intro</a>.</p>',
+        )
+        self.assertEqual(self.body_of(b).strip(), '<h1 id="intro">Intro</h1>\n<p>Hello</p>')
+        for doc in docs:
+            self.assertNotIn("<div", doc)
+            self.assertNotIn("</div>", doc)
+            self.assertTrue(doc.startswith(HEAD[: HEAD.index("<title>")]))
+            self.assertTrue(doc.endswith(TAIL))
+
+    def test_pandoc2_bare_separator(self):
+        docs = self.converter.split_batch_html(PANDOC2_BATCH, ["a", "b"])
+        self.assertEqual(len(docs), 2)
+        self.assertIn('<a href="#intro">', docs[0])
+        self.assertIn("<p>Hello</p>", docs[1])
+        self.assertNotIn(BATCH_SEPARATOR, docs[0] + docs[1])
+
+    def test_count_mismatch_returns_none(self):
+        self.assertIsNone(self.converter.split_batch_html(PANDOC3_BATCH, ["a", "b", "c"]))
+
+    def test_broken_separator_wrapper_returns_none(self):
+        html = PANDOC3_BATCH.replace(f"{BATCH_SEPARATOR}\n</div>", BATCH_SEPARATOR)
+        self.assertIsNone(self.converter.split_batch_html(html, ["a", "b"]))
+
+    def test_link_to_other_batch_file_falls_back(self):
+        # pandoc 把指向批内其他输入文件的链接改写成 #<文件标识>，单独转换时不会如此
+        html = PANDOC3_BATCH.replace(
+            '<p>Hello</p>', '<p><a href="#a.md__intro">back</a></p>'
+        )
+        a, b = self.converter.split_batch_html(html, ["a", "b"])
+        self.assertIsNotNone(a)
+        self.assertIsNone(b)
+
+    def test_footnotes_fall_back(self):
+        html = PANDOC3_BATCH.replace(
+            "<p>Hello</p>",
+            '<p>Hello<a href="#fn1" class="footnote-ref" id="fnref1" role="doc-noteref"><sup>1</sup></a></p>',
+        ).replace(
+            "</div>\n</body>",
+            '</div>\n<section id="footnotes" class="footnotes footnotes-end-of-document" role="doc-endnotes">\n'
+            '<hr />\n<ol>\n<li id="fn1"><p>Note<a href="#fnref1" class="footnote-back" role="doc-backlink">↩︎</a></p></li>\n'
+            "</ol>\n</section>\n</body>",
+        )
+        a, b = self.converter.split_batch_html(html, ["a", "b"])
+        self.assertIsNotNone(a)
+        self.assertIsNone(b)
+
+    def test_yaml_title_block_returns_none(self):
+        html = PANDOC3_BATCH.replace(
+            '<div id="a.md">', '<header id="title-block-header">\n<h1 class="title">T</h1>\n</header>\n<div id="a.md">'
+        )
+        self.assertIsNone(self.converter.split_batch_html(html, ["a", "b"]))
+
+
+class WkhtmltopdfStdinLineTest(unittest.TestCase):
+    def setUp(self):
+        self.converter = ConvertMD(".")
+
+    def test_round_trips_through_shell_style_quoting(self):
+        html_path = Path(r"C:\Users\me\笔记 本\a \"b\".html")
+        output_pdf = Path(r"C:\Users\me\笔记 本\a \"b\".pdf")
+        line = self.converter.build_wkhtmltopdf_stdin_line(html_path, output_pdf)
+        self.assertNotIn("\n", line)
+        expected = self.converter.build_wkhtmltopdf_cmd(html_path, output_pdf)[1:]
+        self.assertEqual(shlex.split(line), expected)
+
+    def test_omits_program_name(self):
+        line = self.converter.build_wkhtmltopdf_stdin_line(Path("a.html"), Path("a.pdf"))
+        self.assertFalse(line.startswith('"wkhtmltopdf"'))
+        self.assertTrue(line.endswith('"a.html" "a.pdf"'))
+
+
+if __name__ == "__main__":
+    unittest.main()